@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 from abc import ABC
+from functools import cached_property
 from typing import List, Optional
 
 import aws_cdk as cdk
@@ -50,7 +51,7 @@ class ModuleSettings(EnvBaseSettings):
     solution_version: Optional[str] = Field(default=None)
 
     @computed_field  # type: ignore
-    @property
+    @cached_property
     def description(self) -> str:
         if self.solution_id and self.solution_name and self.solution_version:
             return f"({self.solution_id}) {self.solution_name}. Version {self.solution_version}"
@@ -74,7 +75,7 @@ class SeedFarmerSettings(EnvBaseSettings):
     module_name: str
 
     @computed_field  # type: ignore
-    @property
+    @cached_property
     def app_prefix(self) -> str:
         """Application prefix."""
         prefix = "-".join([self.project_name, self.deployment_name, self.module_name])
@@ -6,17 +6,19 @@
 import json
 import os
 import sys
-from typing import Any, Dict, List, Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 import replication.helm.commands as helm
 from replication.arguments import parse_args
 from replication.logging import logger
 from replication.parser import parser
-from replication.utils import deep_merge, get_credentials
+from replication.utils import get_credentials
 
 project_path = os.path.realpath(os.path.dirname(__file__))
 repo_secret = os.getenv("SEEDFARMER_PARAMETER_HELM_REPO_SECRET_NAME", None)
 repo_key = os.getenv("SEEDFARMER_PARAMETER_HELM_REPO_SECRET_KEY", None)
+HELM_MAX_WORKERS = 16
 
 
 def update_helm(update_helm: bool, workloads_data: Dict[str, Any]) -> None:
@@ -29,23 +31,45 @@ def update_helm(update_helm: bool, workloads_data: Dict[str, Any]) -> None:
         helm.update_repos()
 
 
+def _fetch_subcharts(name: str, workloads: List[Tuple[str, List[str], str]]) -> Dict[str, Dict[str, Any]]:
+    # Subcharts are untarred into project_path/<chart name>, so every workload using the same chart
+    # is fetched sequentially in a single task
+    return {
+        workload: {
+            subchart: helm.show_subchart(project_path, workload, name, subchart, version) for subchart in subcharts
+        }
+        for workload, subcharts, version in workloads
+    }
+
+
 def fetch_chart_info(workloads_data: Dict[str, Any]) -> Dict[str, Any]:
     parsed_charts = {}  # type: ignore
-    for workload, values in workloads_data.items():
-        parsed_charts[workload] = {}
-        if "images" not in values:
-            continue
-
-        logger.debug("Getting %s data", workload)
-        parsed_charts[workload]["chart"] = helm.show("chart", f"{workload}/{values['name']}", values["version"])
-        parsed_charts[workload]["values"] = helm.show("values", f"{workload}/{values['name']}", values["version"])
-        if "subcharts" in values:
-            parsed_charts[workload]["subcharts"] = {}
-            for subchart in values["subcharts"]:
-                parsed_charts[workload]["subcharts"][subchart] = {}
-                parsed_charts[workload]["subcharts"][subchart] = helm.show_subchart(
-                    project_path, workload, values["name"], subchart, values["version"]
+    subchart_workloads: Dict[str, List[Tuple[str, List[str], str]]] = {}
+    with ThreadPoolExecutor(max_workers=HELM_MAX_WORKERS) as executor:
+        futures: Dict["Future[Any]", Tuple[str, str]] = {}
+        for workload, values in workloads_data.items():
+            parsed_charts[workload] = {}
+            if "images" not in values:
+                continue
+
+            logger.debug("Getting %s data", workload)
+            chart = f"{workload}/{values['name']}"
+            for kind in ("chart", "values"):
+                futures[executor.submit(helm.show, kind, chart, values["version"])] = (workload, kind)
+            if "subcharts" in values:
+                subchart_workloads.setdefault(values["name"], []).append(
+                    (workload, values["subcharts"], values["version"])
                 )
+
+        subchart_futures = [
+            executor.submit(_fetch_subcharts, name, workloads) for name, workloads in subchart_workloads.items()
+        ]
+
+        for future, (workload, kind) in futures.items():
+            parsed_charts[workload][kind] = future.result()
+        for subchart_future in subchart_futures:
+            for workload, subcharts in subchart_future.result().items():
+                parsed_charts[workload]["subcharts"] = subcharts
     return parsed_charts
 
 
@@ -59,33 +83,37 @@ def apply_image_mapping(full_image: str, docker_mappings: Optional[Dict[str, str
         s = image.rstrip("/").split("/")
         dns = s[0]
         reassembled_url = "/".join(s[1:])
-        if dns in docker_mappings.keys():
-            return f"{docker_mappings.get(dns)}/{reassembled_url}:{tag}"
+        mapped = docker_mappings.get(dns)
+        if mapped:
+            return f"{mapped}/{reassembled_url}:{tag}"
     else:
-        if docker_mappings.get("default"):
-            return f"{docker_mappings.get('default')}/{image}:{tag}"
+        default = docker_mappings.get("default")
+        if default:
+            return f"{default}/{image}:{tag}"
     return full_image
 
 
 def apply_chart_info(
-    workloads_data: Dict[str, Any], parsed_charts: Dict[str, Any], registry_prefix: str, images_wip_list: List[str]
+    workloads_data: Dict[str, Any], parsed_charts: Dict[str, Any], registry_prefix: str, images_wip: Set[str]
 ) -> Dict[str, Any]:
     custom_chart_values = {}
     for workload, values in workloads_data.items():
-        custom_chart_values[workload] = {
+        name = values["name"]
+        src_repository = values["repository"]
+        new_r_name = src_repository.rstrip("/").split("/")[-1]
+        chart_values = custom_chart_values[workload] = {
             "helm": {
-                "name": values["name"],
-                "repository": values["repository"],
+                "name": name,
+                "repository": f"oci://{registry_prefix}{new_r_name}/{name}",
                 "version": values["version"],
+                "srcRepository": src_repository,
             },
             "values": {},
         }
-        custom_chart_values[workload]["helm"]["srcRepository"] = values.get("repository")
-        new_r_name = values["repository"].rstrip("/").split("/")[-1]
-        custom_chart_values[workload]["helm"]["repository"] = f"oci://{registry_prefix}{new_r_name}/{values['name']}"
         logger.debug("Chart %s:", workload)
         if "images" in values:
             logger.debug("\tImages:")
+            parsed_chart = parsed_charts[workload]
 
             for image_name, image_data in values["images"].items():
                 registry = None
@@ -93,61 +121,53 @@ def apply_chart_info(
                 tag = None
 
                 # parse registries first
-                for k, v in image_data.items():
-                    if k == "registry":
-                        registry = parser.parse_value(parsed_charts[workload], values, image_name, v, k)
-
-                        if registry:
-                            custom_chart_values[workload]["values"] = parser.add_branch_to_dict(
-                                custom_chart_values[workload]["values"],
-                                v,
-                                f"{registry_prefix}{registry}",
-                            )
-
-                        continue
+                registry_data = image_data.get("registry")
+                if registry_data is not None:
+                    registry = parser.parse_value(parsed_chart, values, image_name, registry_data, "registry")
+
+                    if registry:
+                        chart_values["values"] = parser.add_branch_to_dict(
+                            chart_values["values"],
+                            registry_data,
+                            f"{registry_prefix}{registry}",
+                        )
 
                 # parse repositories and tags
-                for k, v in image_data.items():
-                    if k == "repository":
-                        if "name" in v:
-                            repository = v["name"]
-                            continue
-
-                        repository = parser.parse_value(parsed_charts[workload], values, image_name, v, k)
+                repository_data = image_data.get("repository")
+                if repository_data is not None:
+                    if "name" in repository_data:
+                        repository = repository_data["name"]
+                    else:
+                        repository = parser.parse_value(parsed_chart, values, image_name, repository_data, "repository")
 
                         repository_in_chart_values = repository
                         if not registry:
                             repository_in_chart_values = f"{registry_prefix}{repository}"
 
-                        custom_chart_values[workload]["values"] = parser.add_branch_to_dict(
-                            custom_chart_values[workload]["values"],
-                            v,
+                        chart_values["values"] = parser.add_branch_to_dict(
+                            chart_values["values"],
+                            repository_data,
                             repository_in_chart_values,
                         )
 
-                        continue
-
-                    if k == "tag":
-                        tag = parser.parse_value(parsed_charts[workload], values, image_name, v, k)
-
-                        custom_chart_values[workload]["values"] = parser.add_branch_to_dict(
-                            custom_chart_values[workload]["values"],
-                            v,
-                            tag,
-                        )
-
-                        continue
-
-                # remove some values
-                for k, v in image_data.items():
-                    # set value to empty, e.g. digest as it will be different after push to ECR
-                    if k == "remove":
-                        custom_chart_values[workload]["values"] = parser.add_branch_to_dict(
-                            custom_chart_values[workload]["values"],
-                            v,
-                            "",
-                        )
-                        continue
+                tag_data = image_data.get("tag")
+                if tag_data is not None:
+                    tag = parser.parse_value(parsed_chart, values, image_name, tag_data, "tag")
+
+                    chart_values["values"] = parser.add_branch_to_dict(
+                        chart_values["values"],
+                        tag_data,
+                        tag,
+                    )
+
+                # set value to empty, e.g. digest as it will be different after push to ECR
+                remove_data = image_data.get("remove")
+                if remove_data is not None:
+                    chart_values["values"] = parser.add_branch_to_dict(
+                        chart_values["values"],
+                        remove_data,
+                        "",
+                    )
 
                 image = repository
                 if registry:
@@ -156,10 +176,10 @@ def apply_chart_info(
                     image += f":{tag}"  # type: ignore
 
                 logger.debug("\t\t%s", image)
-                images_wip_list.append(str(image))
+                images_wip.add(str(image))
 
         logger.debug("\tCustom chart values:")
-        logger.debug("\t\t%s", json.dumps(custom_chart_values[workload]))
+        logger.debug("\t\t%s", json.dumps(chart_values))
     return custom_chart_values
 
 
@@ -169,20 +189,14 @@ def main() -> None:
 
     logger.info("EKS version: %s", args.eks_version)
 
-    logger.info(
-        "EKS node AMI image version: %s",
-        parser.get_ami_version(args.versions_dir, args.eks_version),
-    )
+    ami_version = parser.get_ami_version(args.versions_dir, args.eks_version)
+    logger.info("EKS node AMI image version: %s", ami_version)
 
-    images_wip_list = []
+    images_wip: Set[str] = set()
 
     additional_images = parser.get_additional_images(args.versions_dir, args.eks_version)
     docker_mappings = parser.get_docker_mappings(args.versions_dir, args.eks_version)
-    updated_additional_images = {}
-
-    for name, image in additional_images.items():
-        images_wip_list.append(image)
-        updated_additional_images[name] = f"{args.registry_prefix}{image}"
+    updated_additional_images = {name: f"{args.registry_prefix}{image}" for name, image in additional_images.items()}
 
     additional_images_json = {"additional_images": updated_additional_images}
 
@@ -191,18 +205,20 @@ def main() -> None:
     update_helm(args.update_helm, workloads_data)
     # custom_chart_values = {}
     parsed_charts = fetch_chart_info(workloads_data)
-    custom_chart_values = apply_chart_info(workloads_data, parsed_charts, args.registry_prefix, images_wip_list)
+    custom_chart_values = apply_chart_info(workloads_data, parsed_charts, args.registry_prefix, images_wip)
 
     updated_images = []
 
-    for name, image in additional_images.items():
+    # an image listed more than once, or both as an additional image and in a chart, is replicated once
+    unique_additional_images = list(dict.fromkeys(additional_images.values()))
+    for image in unique_additional_images:
         working_image = apply_image_mapping(image, docker_mappings)
         updated_images.append({"src": working_image, "target": f"{args.registry_prefix}{image}"})
-    for image in images_wip_list:
+    for image in sorted(images_wip.difference(unique_additional_images)):
         working_image = apply_image_mapping(image, docker_mappings)
         updated_images.append({"src": working_image, "target": f"{args.registry_prefix}{image}"})
 
-    ami_json = {"ami": {"version": parser.get_ami_version(args.versions_dir, args.eks_version)}}
+    ami_json = {"ami": {"version": ami_version}}
     charts_json = {"charts": custom_chart_values}
 
     #  Add custom rules here....
@@ -220,14 +236,14 @@ def main() -> None:
         "w",
         encoding="utf-8",
     ) as file:
-        file.write(json.dumps(deep_merge(ami_json, charts_json, additional_images_json), indent=4))
+        file.write(json.dumps({**ami_json, **charts_json, **additional_images_json}, separators=(",", ":")))
 
     with open(
         os.path.join(project_path, "updated_images.json"),
         "w",
         encoding="utf-8",
     ) as file:
-        file.write(json.dumps(updated_images, indent=4))
+        json.dump(updated_images, file, indent=4)
 
 
 if __name__ == "__main__":
@@ -2,6 +2,9 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import json
+import threading
+import time
+from argparse import Namespace
 from unittest.mock import patch
 
 import pytest
@@ -10,6 +13,7 @@ from get_list_eks_images import (
     apply_chart_info,
     apply_image_mapping,
     fetch_chart_info,
+    main,
     update_helm,
 )
 
@@ -54,6 +58,53 @@ def test_fetch_chart_info(mock_show_subchart, mock_helm_show, mock_workloads_dat
     assert result == test_case_result
 
 
+def test_fetch_chart_info_multiple_workloads():
+    workloads_data = {
+        "grafana": {"name": "grafana", "version": "7.0.0", "images": {}},
+        "grafana_copy": {"name": "grafana", "version": "7.1.0", "images": {}, "subcharts": ["sidecar", "renderer"]},
+        "prometheus": {"name": "kube-prometheus-stack", "version": "55.0.0", "images": {}, "subcharts": ["grafana"]},
+        "grafana_subcharts": {"name": "grafana", "version": "7.2.0", "images": {}, "subcharts": ["sidecar"]},
+        "no_images": {"name": "crds", "version": "1.0.0"},
+    }
+    active_charts = set()
+    overlapping = []
+    lock = threading.Lock()
+
+    def show(command, chart, version):
+        return {"command": command, "chart": chart, "version": version}
+
+    def show_subchart(project_path, workload, name, subchart, version):
+        with lock:
+            if name in active_charts:
+                overlapping.append(name)
+            active_charts.add(name)
+        time.sleep(0.01)
+        with lock:
+            active_charts.discard(name)
+        return {"workload": workload, "subchart": subchart, "version": version}
+
+    with patch("get_list_eks_images.helm.show", side_effect=show), patch(
+        "get_list_eks_images.helm.show_subchart", side_effect=show_subchart
+    ):
+        result = fetch_chart_info(workloads_data)
+
+    assert overlapping == []
+    assert result["no_images"] == {}
+    for workload, values in workloads_data.items():
+        if "images" not in values:
+            continue
+        chart = f"{workload}/{values['name']}"
+        assert result[workload]["chart"] == {"command": "chart", "chart": chart, "version": values["version"]}
+        assert result[workload]["values"] == {"command": "values", "chart": chart, "version": values["version"]}
+        if "subcharts" in values:
+            assert result[workload]["subcharts"] == {
+                subchart: {"workload": workload, "subchart": subchart, "version": values["version"]}
+                for subchart in values["subcharts"]
+            }
+        else:
+            assert "subcharts" not in result[workload]
+
+
 @patch("get_list_eks_images.helm.add_repo")
 @patch("get_list_eks_images.helm.update_repos")
 @patch("get_list_eks_images.get_credentials")
@@ -92,12 +143,18 @@ def test_apply_chart_info():
     with open("tests/test_payloads/parsed_charts_data.json", encoding="utf-8") as parsed_charts_file:
         parsed_charts_data = json.load(parsed_charts_file)
 
+    images_wip = set()
     result = apply_chart_info(
-        workloads_data, parsed_charts_data, "123456789012.dkr.ecr.us-east-1.amazonaws.com/idffulltest-", []
+        workloads_data, parsed_charts_data, "123456789012.dkr.ecr.us-east-1.amazonaws.com/idffulltest-", images_wip
     )
     with open("tests/test_payloads/custom_chart_values_testcase.json", encoding="utf-8") as workload_file:
         test_case_result = json.load(workload_file)
     assert result == test_case_result
+    assert images_wip == {
+        "ghcr.io/kyverno/policy-reporter-kyverno-plugin:1.6.3",
+        "ghcr.io/kyverno/policy-reporter:2.20.2",
+        "ghcr.io/kyverno/policy-reporter-ui:1.9.2",
+    }
 
 
 def test_apply_image_mapping():
@@ -114,3 +171,104 @@ def test_apply_image_mapping():
         apply_image_mapping("docker.io/grafana/grafana:latest", mappings)
         == "somedns/docker-remote-hub-docker-com/grafana/grafana:latest"
     )
+
+
+def test_apply_image_mapping_default_and_unmapped():
+    mappings = {"default": "somedns/docker-remote-hub-docker-com", "docker.io": ""}
+
+    assert apply_image_mapping("busybox", mappings) == "somedns/docker-remote-hub-docker-com/busybox:latest"
+    assert apply_image_mapping("quay.io/prometheus/node-exporter:v1.7.0", mappings) == (
+        "quay.io/prometheus/node-exporter:v1.7.0"
+    )
+    assert apply_image_mapping("docker.io/grafana/grafana:latest", mappings) == "docker.io/grafana/grafana:latest"
+    assert apply_image_mapping("docker.io/grafana/grafana:latest", None) == "docker.io/grafana/grafana:latest"
+
+
+def test_apply_chart_info_repository_name_and_remove():
+    workloads_data = {
+        "cert_manager": {
+            "name": "cert-manager",
+            "repository": "https://charts.jetstack.io",
+            "version": "v1.14.4",
+            "images": {
+                "controller": {
+                    "repository": {"name": "quay.io/jetstack/cert-manager-controller"},
+                    "tag": {"location": "chart", "path": "appVersion"},
+                    "remove": {"location": "values", "path": "image.digest"},
+                },
+            },
+        }
+    }
+    parsed_charts = {"cert_manager": {"chart": {"appVersion": "v1.14.4"}, "values": {}}}
+    images_wip = set()
+
+    result = apply_chart_info(
+        workloads_data, parsed_charts, "123456789012.dkr.ecr.us-east-1.amazonaws.com/", images_wip
+    )
+
+    assert result["cert_manager"]["values"] == {"appVersion": "v1.14.4", "image": {"digest": ""}}
+    assert result["cert_manager"]["helm"]["repository"] == (
+        "oci://123456789012.dkr.ecr.us-east-1.amazonaws.com/charts.jetstack.io/cert-manager"
+    )
+    assert images_wip == {"quay.io/jetstack/cert-manager-controller:v1.14.4"}
+
+
+def test_main_deduplicates_updated_images(tmp_path):
+    registry_prefix = "123456789012.dkr.ecr.us-east-1.amazonaws.com/"
+    additional_images = {
+        "cloudwatch_agent": "public.ecr.aws/cloudwatch-agent/cloudwatch-agent:1.247358.0b252413",
+        "cloudwatch_agent_alias": "public.ecr.aws/cloudwatch-agent/cloudwatch-agent:1.247358.0b252413",
+        "busybox": "docker.io/library/busybox:1.36",
+    }
+    workloads_data = {
+        workload: {
+            "name": workload,
+            "repository": f"https://charts.example.com/{workload}",
+            "version": "1.0.0",
+            "images": {
+                "main": {
+                    "repository": {"name": repository},
+                    "tag": {"location": "chart", "path": "appVersion"},
+                }
+            },
+        }
+        for workload, repository in [
+            ("first", "docker.io/library/nginx"),
+            ("second", "docker.io/library/nginx"),
+            ("third", "docker.io/library/busybox"),
+        ]
+    }
+    tag = {"first": "1.25", "second": "1.25", "third": "1.36"}
+
+    def show(command, chart, version):
+        return {"appVersion": tag[chart.split("/")[0]]} if command == "chart" else {}
+
+    args = Namespace(eks_version="1.29", versions_dir="versions", registry_prefix=registry_prefix, update_helm=False)
+    with patch("get_list_eks_images.parse_args", return_value=args), patch(
+        "get_list_eks_images.project_path", str(tmp_path)
+    ), patch("get_list_eks_images.parser.get_ami_version", return_value="1.29.0-20240315"), patch(
+        "get_list_eks_images.parser.get_additional_images", return_value=additional_images
+    ), patch("get_list_eks_images.parser.get_docker_mappings", return_value={}), patch(
+        "get_list_eks_images.parser.get_workloads", return_value=workloads_data
+    ), patch("get_list_eks_images.helm.show", side_effect=show):
+        main()
+
+    with open(tmp_path / "updated_images.json", encoding="utf-8") as updated_images_file:
+        updated_images = json.load(updated_images_file)
+    with open(tmp_path / "replication-result.json", encoding="utf-8") as result_file:
+        result = json.load(result_file)
+
+    targets = [image["target"] for image in updated_images]
+    assert sorted(targets) == sorted(
+        f"{registry_prefix}{image}"
+        for image in [
+            "public.ecr.aws/cloudwatch-agent/cloudwatch-agent:1.247358.0b252413",
+            "docker.io/library/busybox:1.36",
+            "docker.io/library/nginx:1.25",
+        ]
+    )
+    assert result["ami"] == {"version": "1.29.0-20240315"}
+    assert result["additional_images"] == {
+        name: f"{registry_prefix}{image}" for name, image in additional_images.items()
+    }
+    assert set(result["charts"]) == set(workloads_data)
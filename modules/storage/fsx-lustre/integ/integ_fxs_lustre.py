@@ -23,8 +23,14 @@ def get_module_dependencies(resource_keys: List[str]) -> Dict[str, str]:
     ssm = boto3.client("ssm", region_name="us-east-1")
     dependencies = {}
     try:
-        for key in resource_keys:
-            dependencies[key] = ssm.get_parameter(Name=f"/module-integration-tests/{key}")["Parameter"]["Value"]
+        # get_parameters accepts at most 10 names per call
+        for i in range(0, len(resource_keys), 10):
+            names = {f"/module-integration-tests/{key}": key for key in resource_keys[i : i + 10]}
+            response = ssm.get_parameters(Names=list(names))
+            for parameter in response["Parameters"]:
+                dependencies[names[parameter["Name"]]] = parameter["Value"]
+            if response["InvalidParameters"]:
+                print(f"issue getting dependencies: parameters not found {response['InvalidParameters']}")
     except Exception as e:
         print(f"issue getting dependencies: {e}")
     return dependencies